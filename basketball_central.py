@@ -9,6 +9,7 @@ from nba_api.stats.endpoints import commonteamroster, playerdashboardbygeneralsp
 from gspread.utils import rowcol_to_a1
 import numpy as np
 import matplotlib.colors as mcolors
+from snapshot import write_snapshot, STAT_NAMES
 
 # connects to the Google Sheet
 scopes = [
@@ -95,6 +96,7 @@ PLAYER_STATS_START_COLUMN = "K"
 MASTER_DATA_START_ROW = 1
 MASTER_INFO_START_COLUMN_NUM = 1
 MASTER_INFO_END_COLUMN_NUM = 10
+MASTER_TEAM_COLUMN_NUM = 3
 MASTER_ID_COLUMN_NUM = 31
 
 # columns containing per 100 stats on the master NBA sheet
@@ -120,12 +122,21 @@ master_stat_columns = [
     "AD",
 ]
 
+# snapshot stat names keyed by team sheet column, so a reordered sheet can't mislabel stats
+if not len(team_stat_columns) == len(master_stat_columns) == len(STAT_NAMES):
+    raise ValueError(
+        "Team and master sheet stat columns must line up with the snapshot stat names."
+    )
+team_stat_names = dict(zip(team_stat_columns, STAT_NAMES))
+reversed_stat_names = [team_stat_names[col] for col in REVERSED_TEAM_STATS_COLUMNS]
+
 stats_collection = {
     category: [] for category in team_stat_columns
 }  # stores stat values for percentile calculations
 
 empty_rows = {}  # stores rows with no data for color coding
 removed_players = {}
+snapshot_players = {}  # stores end-of-run player data for the local snapshot
 
 
 # fetches RAPM data for the current season
@@ -263,7 +274,9 @@ def update_team_sheet(team_abbr):
             empty_rows[team_abbr].append(row_index)
             if id != "-":  # if the row contains a player
                 rows_to_clear[row_index] = id
-                player_data_row = team_sheet.row_values(row_index)[0:28]
+                player_data_row = team_sheet.row_values(row_index)[
+                    0 : PLAYER_STATS_END_COLUMN_NUM - 1
+                ]
                 removed_players[id] = player_data_row
                 print(f"Player ID #{id} removed from {team_abbr} team sheet.")
     if len(empty_rows[team_abbr]) > 4:
@@ -498,7 +511,7 @@ def update_removed_players(removed_players):
                         {"range": "C{master_row}", "values": [["FA"]]},
                         {
                             "range": "D{master_row}:AC{master_row}",
-                            "values": [[player_data[2:29]]],
+                            "values": [[player_data[2:28]]],
                         },
                         {"range": "AD{master_row}", "values": [[player_id]]},
                     ]
@@ -512,11 +525,19 @@ def update_removed_players(removed_players):
 
 def scrape_team_sheets(team_abbr):
     team_sheet = sheet.worksheet(team_abbr)
-    stats_range = team_sheet.get_all_values(
-        f"{PLAYER_STATS_START_COLUMN}{PLAYER_DATA_START_ROW}:{TEAM_ID_COLUMN}{PLAYER_DATA_END_ROW}"
+    # reads player info along with stats so the snapshot costs no extra requests
+    player_range = team_sheet.get_all_values(
+        f"{PLAYER_INFO_START_COLUMN}{PLAYER_DATA_START_ROW}:{TEAM_ID_COLUMN}{PLAYER_DATA_END_ROW}"
     )
 
-    for row_index, player in enumerate(stats_range, start=PLAYER_DATA_START_ROW):
+    for row_index, player_row in enumerate(player_range, start=PLAYER_DATA_START_ROW):
+        player = player_row[PLAYER_STATS_START_COLUMN_NUM - 1 :]
+        if len(player_row) >= PLAYER_STATS_END_COLUMN_NUM:
+            player_id = player_row[PLAYER_STATS_END_COLUMN_NUM - 1]
+            if player_id not in ("", "-"):
+                snapshot_players[player_id] = snapshot_player_entry(
+                    player_row, team_abbr
+                )
         if player[0] != " ":
             for col_index, col in enumerate(team_stat_columns):
                 stats_collection[col].append((player[col_index], player[1]))
@@ -527,6 +548,41 @@ def scrape_team_sheets(team_abbr):
         print(f"Scraped {team_abbr} team sheet.")
 
 
+# converts a formatted sheet value (e.g. "45.3%") to a number, or None if blank
+def parse_stat_value(value):
+    try:
+        return float(str(value).replace("%", "").replace(",", ""))
+    except ValueError:
+        return None
+
+
+# builds a snapshot entry from a team sheet row (info columns followed by stats)
+def snapshot_player_entry(player_row, team_abbr):
+    if len(player_row) < PLAYER_STATS_END_COLUMN_NUM - 1:
+        raise ValueError(
+            f"Player row for {player_row[1]} is missing stat columns for the snapshot."
+        )
+    stat_values = player_row[
+        PLAYER_STATS_START_COLUMN_NUM - 1 : PLAYER_STATS_END_COLUMN_NUM - 1
+    ]
+
+    return {
+        "name": player_row[1],
+        "team": team_abbr,
+        "position": player_row[2],
+        "number": player_row[3],
+        "experience": player_row[4],
+        "age": parse_stat_value(player_row[5]),
+        "height": player_row[6],
+        "wingspan": player_row[7],
+        "weight": player_row[8],
+        "stats": {
+            stat: parse_stat_value(value)
+            for stat, value in zip(team_stat_names.values(), stat_values)
+        },
+    }
+
+
 # calculates percentiles (weighted by minutes played) for each stat category
 def calculate_weighted_percentiles(stats_collection):
     print("Calculating percentiles.")
@@ -557,6 +613,66 @@ def calculate_weighted_percentiles(stats_collection):
     return percentiles_dict
 
 
+# calculates snapshot percentiles per player, flipping stats where lower is better
+def calculate_snapshot_percentiles(snapshot_players):
+    snapshot_stats = {stat: [] for stat in STAT_NAMES}
+    snapshot_player_ids = {stat: [] for stat in STAT_NAMES}
+
+    for player_id, player in snapshot_players.items():
+        minutes = player["stats"]["min"]
+        if not minutes:
+            continue
+        for stat, value in player["stats"].items():
+            if value is not None:
+                snapshot_stats[stat].append((value, minutes))
+                snapshot_player_ids[stat].append(player_id)
+
+    percentiles_dict = calculate_weighted_percentiles(
+        {stat: stats for stat, stats in snapshot_stats.items() if stats}
+    )
+
+    snapshot_percentiles = {}
+    for stat, percentiles in percentiles_dict.items():
+        for player_id, percentile in zip(snapshot_player_ids[stat], percentiles):
+            if stat in reversed_stat_names:
+                percentile = 100 - percentile
+            snapshot_percentiles.setdefault(player_id, {})[stat] = round(percentile, 1)
+
+    return snapshot_percentiles
+
+
+# publishes rosters, stats, percentiles and free agents to a local snapshot
+def publish_snapshot():
+    # players released in earlier runs are only marked as free agents on the master sheet
+    for master_row in master_sheet.get_all_values():
+        if len(master_row) < MASTER_ID_COLUMN_NUM:
+            continue
+        player_id = master_row[MASTER_ID_COLUMN_NUM - 1]
+        if (
+            master_row[MASTER_TEAM_COLUMN_NUM - 1] == "FA"
+            and player_id not in ("", "-")
+            and player_id not in snapshot_players
+        ):
+            # dropping the team column lines the master row up with a team sheet row
+            snapshot_players[player_id] = snapshot_player_entry(
+                master_row[: MASTER_TEAM_COLUMN_NUM - 1]
+                + master_row[MASTER_TEAM_COLUMN_NUM:],
+                "FA",
+            )
+
+    # players released this run carry the latest data from their old team sheet
+    for player_id, player_data in removed_players.items():
+        if (
+            player_id not in snapshot_players
+            or snapshot_players[player_id]["team"] == "FA"
+        ):
+            snapshot_players[player_id] = snapshot_player_entry(player_data, "FA")
+
+    # free agents are ranked alongside rostered players so percentile filters cover them
+    snapshot_percentiles = calculate_snapshot_percentiles(snapshot_players)
+    write_snapshot(snapshot_players, snapshot_percentiles)
+
+
 # convert percentiles into a green --> yellow --> red gradient color scale
 def percentile_to_color(percentile):
     cmap = mcolors.LinearSegmentedColormap.from_list(
@@ -667,3 +783,5 @@ percentiles_dict = calculate_weighted_percentiles(stats_collection)
 for team_abbr in team_sheets:
     apply_percentile_colors(percentiles_dict)
     time.sleep(15)
+
+publish_snapshot()
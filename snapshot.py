@@ -0,0 +1,330 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import sqlite3
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# where published snapshots live and the file pointing at the newest one
+SNAPSHOT_DIR = "snapshots"
+LATEST_FILE = "LATEST"
+SNAPSHOT_RETENTION = 10  # number of published snapshots kept on disk
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8080
+
+# per 100 stat categories, in the same order as the stat columns on the sheets
+STAT_NAMES = [
+    "gm",
+    "min",
+    "orapm",
+    "drapm",
+    "pts",
+    "ts",
+    "two_pa",
+    "two_p_pct",
+    "three_pa",
+    "three_p_pct",
+    "fta",
+    "ft_pct",
+    "ast",
+    "tov",
+    "oreb",
+    "dreb",
+    "stl",
+    "blk",
+    "fls",
+]
+
+PLAYER_INFO_NAMES = [
+    "name",
+    "team",
+    "position",
+    "number",
+    "experience",
+    "age",
+    "height",
+    "wingspan",
+    "weight",
+]
+
+
+# creates the snapshot tables, indexed for lookups by player_id, team and position
+def create_snapshot_tables(conn):
+    stat_columns = ", ".join(f"{stat} REAL" for stat in STAT_NAMES)
+    conn.executescript(
+        f"""
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE players (
+            player_id TEXT PRIMARY KEY,
+            name TEXT,
+            team TEXT,
+            position TEXT,
+            number TEXT,
+            experience TEXT,
+            age REAL,
+            height TEXT,
+            wingspan TEXT,
+            weight TEXT
+        );
+        CREATE TABLE stats (player_id TEXT PRIMARY KEY, {stat_columns});
+        CREATE TABLE percentiles (player_id TEXT PRIMARY KEY, {stat_columns});
+        CREATE INDEX players_team ON players (team);
+        CREATE INDEX players_position ON players (position);
+        """
+    )
+
+
+# writes an immutable SQLite snapshot and points LATEST at it once it is complete
+def write_snapshot(
+    players, percentiles, snapshot_dir=SNAPSHOT_DIR, retention=SNAPSHOT_RETENTION
+):
+    os.makedirs(snapshot_dir, exist_ok=True)
+    snapshot_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+    snapshot_path = os.path.join(snapshot_dir, f"{snapshot_id}.sqlite")
+    if os.path.exists(snapshot_path):
+        raise FileExistsError(f"Snapshot {snapshot_id} has already been published")
+    tmp_path = f"{snapshot_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        with conn:
+            create_snapshot_tables(conn)
+            conn.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [
+                    ("snapshot_id", snapshot_id),
+                    ("created_at", datetime.now().isoformat(timespec="seconds")),
+                ],
+            )
+            conn.executemany(
+                f"INSERT INTO players VALUES (?, {', '.join('?' for _ in PLAYER_INFO_NAMES)})",
+                [
+                    [player_id] + [player[info] for info in PLAYER_INFO_NAMES]
+                    for player_id, player in players.items()
+                ],
+            )
+            stat_placeholders = ", ".join("?" for _ in STAT_NAMES)
+            conn.executemany(
+                f"INSERT INTO stats VALUES (?, {stat_placeholders})",
+                [
+                    [player_id] + [player["stats"].get(stat) for stat in STAT_NAMES]
+                    for player_id, player in players.items()
+                ],
+            )
+            conn.executemany(
+                f"INSERT INTO percentiles VALUES (?, {stat_placeholders})",
+                [
+                    [player_id] + [player_percentiles.get(stat) for stat in STAT_NAMES]
+                    for player_id, player_percentiles in percentiles.items()
+                ],
+            )
+    finally:
+        conn.close()
+    os.replace(tmp_path, snapshot_path)
+
+    latest_path = os.path.join(snapshot_dir, LATEST_FILE)
+    with open(f"{latest_path}.tmp", "w") as latest:
+        latest.write(os.path.basename(snapshot_path))
+    os.replace(f"{latest_path}.tmp", latest_path)
+
+    print(f"Snapshot {snapshot_id} published with {len(players)} players.")
+    prune_snapshots(snapshot_dir, retention)
+    return snapshot_path
+
+
+# removes all but the newest snapshots; ids are timestamps, so names sort by age
+def prune_snapshots(snapshot_dir=SNAPSHOT_DIR, retention=SNAPSHOT_RETENTION):
+    latest_name = f"{latest_snapshot_id(snapshot_dir)}.sqlite"
+    snapshot_names = sorted(
+        name
+        for name in os.listdir(snapshot_dir)
+        if name.endswith(".sqlite") and name != latest_name
+    )
+    retention = max(retention - 1, 0)  # the snapshot LATEST points at is always kept
+    for name in snapshot_names[: max(len(snapshot_names) - retention, 0)]:
+        os.remove(os.path.join(snapshot_dir, name))
+        print(f"Removed old snapshot {os.path.splitext(name)[0]}.")
+
+
+# returns the id of the newest published snapshot, or None if nothing is published
+def latest_snapshot_id(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, LATEST_FILE)) as latest:
+            return os.path.splitext(latest.read().strip())[0]
+    except OSError:
+        return None
+
+
+def open_snapshot(snapshot_id, snapshot_dir=SNAPSHOT_DIR):
+    snapshot_uri = Path(snapshot_dir, f"{snapshot_id}.sqlite").resolve().as_uri()
+    conn = sqlite3.connect(f"{snapshot_uri}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def query_snapshot_meta(conn):
+    return dict(conn.execute("SELECT key, value FROM meta").fetchall())
+
+
+# filters players by player_id, team, position and min_pct_<stat>/max_pct_<stat> thresholds
+def query_players(conn, params):
+    clauses = []
+    args = []
+
+    for key, value in params.items():
+        if key == "player_id":
+            clauses.append("p.player_id = ?")
+            args.append(value)
+        elif key == "team":
+            clauses.append("p.team = ?")
+            args.append(value.upper())
+        elif key == "position":
+            position = value.strip().upper()
+            if not position:
+                raise ValueError("Position filter must not be empty")
+            # positions can be combined on the sheet (e.g. "G/F"), so match whole parts
+            clauses.append(
+                "instr('/' || upper(replace(p.position, ' ', '')) || '/', '/' || ? || '/') > 0"
+            )
+            args.append(position)
+        elif key.startswith(("min_pct_", "max_pct_")):
+            stat = key[len("min_pct_") :]
+            if stat not in STAT_NAMES:
+                raise ValueError(f"Unknown stat category: {stat}")
+            try:
+                threshold = float(value)
+            except ValueError:
+                threshold = math.nan
+            if not math.isfinite(threshold):
+                raise ValueError(f"Percentile threshold for {key} must be a number")
+            clauses.append(f"pct.{stat} {'>=' if key.startswith('min') else '<='} ?")
+            args.append(threshold)
+        else:
+            raise ValueError(f"Unknown filter: {key}")
+
+    columns = ", ".join(
+        [f"p.{info}" for info in PLAYER_INFO_NAMES]
+        + [f"s.{stat} AS stat_{stat}" for stat in STAT_NAMES]
+        + [f"pct.{stat} AS pct_{stat}" for stat in STAT_NAMES]
+    )
+    rows = conn.execute(
+        f"""
+        SELECT p.player_id, {columns}
+        FROM players p
+        LEFT JOIN stats s ON s.player_id = p.player_id
+        LEFT JOIN percentiles pct ON pct.player_id = p.player_id
+        {'WHERE ' + ' AND '.join(clauses) if clauses else ''}
+        ORDER BY p.team, p.name
+        """,
+        args,
+    ).fetchall()
+
+    return [
+        {
+            "player_id": row["player_id"],
+            **{info: row[info] for info in PLAYER_INFO_NAMES},
+            "stats": {stat: row[f"stat_{stat}"] for stat in STAT_NAMES},
+            "percentiles": {stat: row[f"pct_{stat}"] for stat in STAT_NAMES},
+        }
+        for row in rows
+    ]
+
+
+# serves the latest snapshot as JSON; snapshots never change once published,
+# so the snapshot id and resolved response body give a stable ETag
+class SnapshotRequestHandler(BaseHTTPRequestHandler):
+    snapshot_dir = SNAPSHOT_DIR
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        path = url.path.rstrip("/")
+
+        snapshot_id = latest_snapshot_id(self.snapshot_dir)
+        if snapshot_id is None:
+            self.send_json(503, {"error": "No snapshot has been published yet"})
+            return
+
+        conn = None
+        try:
+            conn = open_snapshot(snapshot_id, self.snapshot_dir)
+            if path == "/snapshot":
+                body = query_snapshot_meta(conn)
+            elif path == "/players":
+                body = {"snapshot_id": snapshot_id, "players": query_players(conn, params)}
+            elif path == "/free_agents":
+                params["team"] = "FA"
+                body = {"snapshot_id": snapshot_id, "players": query_players(conn, params)}
+            elif path.startswith("/players/"):
+                params["player_id"] = path[len("/players/") :]
+                players = query_players(conn, params)
+                if not players:
+                    self.send_json(404, {"error": "Player not found"})
+                    return
+                body = {"snapshot_id": snapshot_id, "player": players[0]}
+            else:
+                self.send_json(404, {"error": f"Unknown endpoint: {url.path}"})
+                return
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        except sqlite3.Error as e:
+            self.send_json(503, {"error": f"Snapshot {snapshot_id} is unavailable: {e}"})
+            return
+        finally:
+            if conn is not None:
+                conn.close()
+
+        # only a representation that resolved can be revalidated
+        etag = f'"{hashlib.sha1(f"{snapshot_id}{json.dumps(body)}".encode()).hexdigest()}"'
+        if_none_match = self.headers.get("If-None-Match", "")
+        if if_none_match.strip() == "*" or etag in [
+            tag.strip() for tag in if_none_match.split(",")
+        ]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_json(200, body, etag)
+
+    def send_json(self, status, body, etag=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if etag:
+            self.send_header("ETag", etag)
+            # clients must revalidate, since a newer snapshot may have been published
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(host=SERVER_HOST, port=SERVER_PORT, snapshot_dir=SNAPSHOT_DIR):
+    SnapshotRequestHandler.snapshot_dir = snapshot_dir
+    server = ThreadingHTTPServer((host, port), SnapshotRequestHandler)
+    print(f"Serving snapshots from {snapshot_dir} on http://{host}:{port}.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve the latest Basketball Central snapshot over HTTP."
+    )
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.snapshot_dir)
@@ -0,0 +1,198 @@
+import json
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import snapshot
+from snapshot import (
+    STAT_NAMES,
+    SnapshotRequestHandler,
+    latest_snapshot_id,
+    open_snapshot,
+    query_players,
+    write_snapshot,
+)
+
+
+def make_player(name, team, position, pts):
+    stats = {stat: 1.0 for stat in STAT_NAMES}
+    stats["pts"] = pts
+    return {
+        "name": name,
+        "team": team,
+        "position": position,
+        "number": "1",
+        "experience": "3",
+        "age": 25.0,
+        "height": "6'5\"",
+        "wingspan": "6'9\"",
+        "weight": "200",
+        "stats": stats,
+    }
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    players = {
+        "1": make_player("Guard", "BOS", "G", 30.0),
+        "2": make_player("Point Guard", "BOS", "PG", 20.0),
+        "3": make_player("Wing", "LAL", "G/F", 10.0),
+        "4": make_player("Free Agent", "FA", "C", 25.0),
+        "5": make_player("Lower Case", "LAL", "f / g", 5.0),
+    }
+    percentiles = {
+        "1": {"pts": 90.0},
+        "2": {"pts": 60.0},
+        "3": {"pts": 10.0},
+        "4": {"pts": 80.0},
+    }
+    write_snapshot(players, percentiles, str(tmp_path))
+    return str(tmp_path)
+
+
+@pytest.fixture
+def conn(snapshot_dir):
+    conn = open_snapshot(latest_snapshot_id(snapshot_dir), snapshot_dir)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def server_url(snapshot_dir):
+    handler = type(
+        "TestHandler",
+        (SnapshotRequestHandler,),
+        {"snapshot_dir": snapshot_dir, "log_message": lambda *args: None},
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def player_names(players):
+    return [player["name"] for player in players]
+
+
+def test_query_players_filters_by_team(conn):
+    assert player_names(query_players(conn, {"team": "bos"})) == [
+        "Guard",
+        "Point Guard",
+    ]
+
+
+def test_query_players_matches_whole_positions(conn):
+    assert player_names(query_players(conn, {"position": "g"})) == [
+        "Guard",
+        "Lower Case",
+        "Wing",
+    ]
+
+
+def test_query_players_rejects_empty_position(conn):
+    with pytest.raises(ValueError):
+        query_players(conn, {"position": " "})
+
+
+def test_query_players_filters_by_percentile_thresholds(conn):
+    players = query_players(conn, {"min_pct_pts": "50", "max_pct_pts": "85"})
+    assert player_names(players) == ["Point Guard", "Free Agent"]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"min_pct_xyz": "50"},
+        {"min_pct_pts": "nan"},
+        {"max_pct_pts": "inf"},
+        {"min_pct_pts": "high"},
+        {"colour": "green"},
+    ],
+)
+def test_query_players_rejects_bad_filters(conn, params):
+    with pytest.raises(ValueError):
+        query_players(conn, params)
+
+
+def test_write_snapshot_refuses_to_overwrite(tmp_path, monkeypatch):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2020, 1, 1)
+
+    monkeypatch.setattr(snapshot, "datetime", FrozenDatetime)
+    write_snapshot({}, {}, str(tmp_path))
+    with pytest.raises(FileExistsError):
+        write_snapshot({}, {}, str(tmp_path))
+
+
+def test_write_snapshot_prunes_old_snapshots(tmp_path):
+    for day in range(1, 4):
+        sqlite3.connect(tmp_path / f"2020010{day}T000000.sqlite").close()
+    write_snapshot({}, {}, str(tmp_path), retention=2)
+    assert sorted(path.name for path in tmp_path.glob("*.sqlite")) == [
+        "20200103T000000.sqlite",
+        f"{latest_snapshot_id(str(tmp_path))}.sqlite",
+    ]
+
+
+def test_free_agents_endpoint_only_returns_free_agents(server_url):
+    status, _, body = get(f"{server_url}/free_agents?team=BOS&min_pct_pts=50")
+    assert status == 200
+    assert player_names(json.loads(body)["players"]) == ["Free Agent"]
+
+
+def test_player_endpoint(server_url):
+    status, _, body = get(f"{server_url}/players/3")
+    assert status == 200
+    assert json.loads(body)["player"]["name"] == "Wing"
+    assert get(f"{server_url}/players/99")[0] == 404
+
+
+def test_bad_filter_returns_400(server_url):
+    assert get(f"{server_url}/players?min_pct_pts=nan")[0] == 400
+
+
+def test_if_none_match_returns_304(server_url):
+    status, headers, _ = get(f"{server_url}/players?team=BOS")
+    assert status == 200
+    etag = headers["ETag"]
+    assert get(f"{server_url}/players?team=BOS", {"If-None-Match": etag})[0] == 304
+    assert get(f"{server_url}/players?team=LAL", {"If-None-Match": etag})[0] == 200
+
+
+def test_missing_snapshot_file_returns_503(server_url, snapshot_dir):
+    with open(f"{snapshot_dir}/LATEST", "w") as latest:
+        latest.write("19990101T000000.sqlite")
+    status, _, body = get(f"{server_url}/players")
+    assert status == 503
+    assert "error" in json.loads(body)
+
+
+@pytest.mark.parametrize(
+    "path, status",
+    [
+        ("/nope", 404),
+        ("/players/99", 404),
+        ("/players?min_pct_pts=nan", 400),
+        ("/players", 304),
+    ],
+)
+def test_if_none_match_star_only_matches_existing_responses(server_url, path, status):
+    assert get(f"{server_url}{path}", {"If-None-Match": "*"})[0] == status